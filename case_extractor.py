@@ -0,0 +1,131 @@
+import os
+import hashlib
+
+import orjson
+
+from llm_client import MAX_INPUT_TOKENS, get_client
+from prompts import SYSTEM_MESSAGE, STATIC_RULES, CASE_SCHEMA
+
+# Model routing: short decisions can go to the cheaper tier
+DEFAULT_MODEL = "gpt-4.1-mini"
+SMALL_MODEL = "gpt-4.1-nano"
+SHORT_TEXT_CHARS = 3000
+
+# Opt-in (IMLI_SMALL_MODEL_ROUTING=1 in the environment) until the nano tier has been
+# evaluated on held-out decisions; off by default, so every case uses DEFAULT_MODEL
+SMALL_MODEL_ROUTING = os.getenv("IMLI_SMALL_MODEL_ROUTING", "0") == "1"
+
+# Fixed sampling so identical inputs give identical (cacheable) outputs
+TEMPERATURE = 0
+SEED = 0
+
+# The schema is bounded (a dozen fields, short arrays); cap output to bound worst-case latency and cost.
+# A typical result (day4_extracted_case.json) is ~550 tokens, so leave room for longer decisions.
+MAX_OUTPUT_TOKENS = 1500
+
+# Embeddings for the near-duplicate (semantic) cache
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_INPUT_CHARS = 2000
+
+# Fingerprint of everything else that shapes the model's answer (prompts, schema, input/output caps)
+PROMPT_HASH = hashlib.sha256(
+    orjson.dumps(
+        [SYSTEM_MESSAGE, STATIC_RULES, CASE_SCHEMA, MAX_OUTPUT_TOKENS, MAX_INPUT_TOKENS],
+        option=orjson.OPT_SORT_KEYS,
+    )
+).hexdigest()[:12]
+
+# Identifies the extraction setup; part of every cache key so upgrades don't serve stale results
+_ROUTING_TAG = f"{SMALL_MODEL}<{SHORT_TEXT_CHARS}|" if SMALL_MODEL_ROUTING else ""
+MODEL_TAG = (
+    f"{_ROUTING_TAG}{DEFAULT_MODEL}|temperature={TEMPERATURE}|seed={SEED}"
+    f"|prompt={PROMPT_HASH}"
+)
+
+
+def pick_model(text: str) -> str:
+    """
+    Choose the model tier for a decision based on the length of its text.
+    Always DEFAULT_MODEL unless SMALL_MODEL_ROUTING is enabled.
+    """
+    if SMALL_MODEL_ROUTING and len(text) < SHORT_TEXT_CHARS:
+        return SMALL_MODEL
+    return DEFAULT_MODEL
+
+
+def embed_text(text: str) -> list:
+    """
+    Return an embedding of the start of the decision text for similarity lookups.
+    """
+    response = get_client().embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=text[:EMBEDDING_INPUT_CHARS],
+    )
+    return response.data[0].embedding
+
+
+def build_extraction_request(text: str) -> dict:
+    """
+    Build the chat completion parameters for extracting one decision.
+    Shared by the direct call and the Batch API so both send identical prompts.
+    """
+    return {
+        "model": pick_model(text),
+        "temperature": TEMPERATURE,
+        "seed": SEED,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "case", "strict": True, "schema": CASE_SCHEMA},
+        },
+        "messages": [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": STATIC_RULES + text},
+        ],
+    }
+
+
+class ExtractionError(RuntimeError):
+    """
+    The model returned no usable case JSON (refusal, truncated or empty output).
+    """
+
+
+def parse_completion(content, finish_reason: str, refusal=None) -> dict:
+    """
+    Check one completion choice and parse its JSON, raising ExtractionError
+    with a clear reason when the output was refused or cut off.
+    """
+    if refusal:
+        raise ExtractionError(f"Model refused to extract the case: {refusal}")
+    if finish_reason == "length":
+        raise ExtractionError(f"Model output hit max_tokens={MAX_OUTPUT_TOKENS} before the JSON was complete")
+    if content is None:
+        raise ExtractionError(f"Model returned no content (finish_reason={finish_reason})")
+    return parse_case_json(content)
+
+
+def parse_case_json(raw_content: str) -> dict:
+    """
+    Parse the model's JSON output, printing the raw output if it is invalid.
+    """
+    try:
+        return orjson.loads(raw_content)
+    except orjson.JSONDecodeError:
+        print("❌ Failed to parse JSON. Raw model output:")
+        print(raw_content)
+        raise
+
+
+def extract_case_json(text: str) -> dict:
+    """
+    Send decision text to OpenAI with the strict extraction prompt
+    and return the parsed JSON object as a Python dict.
+    """
+    response = get_client().chat.completions.create(**build_extraction_request(text))
+    choice = response.choices[0]
+    return parse_completion(
+        choice.message.content,
+        choice.finish_reason,
+        getattr(choice.message, "refusal", None),
+    )
@@ -1,17 +1,17 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 import anthropic
 
+from llm_client import get_client
+
 # Load .env file variables (your secret keys)
 load_dotenv()
 
-# Read API keys from environment variables
-openai_key = os.getenv("OPENAI_API_KEY")
+# Read API keys from environment variables (get_client reads OPENAI_API_KEY itself)
 anthropic_key = os.getenv("ANTHROPIC_API_KEY")
 
 # Initialize clients
-openai_client = OpenAI(api_key=openai_key)
+openai_client = get_client()
 anthropic_client = anthropic.Anthropic(api_key=anthropic_key)
 
 # Immigration law prompt for testing
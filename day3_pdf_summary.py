@@ -1,18 +1,12 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+from llm_client import TEXT_PREFETCH_CHARS, get_client, truncate_to_tokens
 from pdf_reader import extract_text_from_pdf
 
-# Load API key
-load_dotenv()
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+openai_client = get_client()
 
 # Load PDF
 pdf_path = "sample.pdf"   # Change if needed
-pdf_text = extract_text_from_pdf(pdf_path)
-
-# Limit text (to avoid flooding the model)
-pdf_text_chunk = pdf_text[:12000]  # ~12k chars for safety
+# Limit text (to avoid flooding the model): read only the first pages, then cap by tokens
+pdf_text_chunk = truncate_to_tokens(extract_text_from_pdf(pdf_path, max_chars=TEXT_PREFETCH_CHARS))
 
 prompt = f"""
 You are an immigration law analyst.
@@ -0,0 +1,42 @@
+import os
+import functools
+
+import tiktoken
+from dotenv import load_dotenv
+from openai import OpenAI
+
+# Token budget for the decision text sent with each prompt
+MAX_INPUT_TOKENS = 4000
+
+# Characters to extract before token truncation; generous so dense text still fills the budget
+TEXT_PREFETCH_CHARS = MAX_INPUT_TOKENS * 6
+
+
+@functools.lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """
+    Return the shared OpenAI client, creating it (and loading .env) on first use.
+    Reusing one client keeps the SDK's pooled connections to api.openai.com alive across calls.
+    """
+    load_dotenv()
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@functools.lru_cache(maxsize=1)
+def get_encoding() -> tiktoken.Encoding:
+    """
+    Return the tokenizer used by the gpt-4.1 model family (o200k_base), loaded on first use.
+    """
+    return tiktoken.get_encoding("o200k_base")
+
+
+def truncate_to_tokens(text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+    """
+    Cut text to at most max_tokens tokens, so prompts are sized by what the model counts.
+    """
+    enc = get_encoding()
+    # PDF text is untrusted input: treat strings like "<|endoftext|>" as plain text
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[:max_tokens])
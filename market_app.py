@@ -1,15 +1,34 @@
 import os
+import sqlite3
 from datetime import datetime
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 
 # --- Extensions ---
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 
 
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Put SQLite in WAL mode so readers don't block on writers (e.g. two sign-ups at once).
+    No-op for other databases such as Postgres.
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
 # --- App Factory ---
 def create_app():
     app = Flask(__name__)
@@ -17,10 +36,17 @@ def create_app():
     # In real prod you'll use a strong secret via environment variable
     app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me")
 
-    # SQLite for now; later we can switch to Postgres
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///imli_marketplace.db"
+    # SQLite for now; set DATABASE_URL to switch to Postgres
+    database_uri = os.getenv("DATABASE_URL", "sqlite:///imli_marketplace.db")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    engine_options = {"pool_pre_ping": True}
+    # SQLite gets StaticPool (in-memory) or NullPool (file, SQLAlchemy 1.4), which reject sizing args
+    if make_url(database_uri).get_backend_name() != "sqlite":
+        engine_options.update(pool_size=10, max_overflow=20)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+
     db.init_app(app)
     bcrypt.init_app(app)
 
@@ -34,6 +60,10 @@ class User(db.Model):
     Base user model. Lawyers and Applicants both live here, with role-based profiles.
     """
     __tablename__ = "users"
+    __table_args__ = (
+        # Marketplace searches filter by role and verification together
+        db.Index("ix_users_role_is_verified", "role", "is_verified"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
@@ -88,7 +118,7 @@ class LawyerProfile(db.Model):
     law_firm_name = db.Column(db.String(255), nullable=True)
 
     # Practice details
-    primary_visa_focus = db.Column(db.String(50), nullable=True)  # e.g. "O-1", "EB-2 NIW", "F-1"
+    primary_visa_focus = db.Column(db.String(50), nullable=True, index=True)  # e.g. "O-1", "EB-2 NIW", "F-1"
     other_visa_types = db.Column(db.String(255), nullable=True)   # comma-separated for MVP
 
     years_experience = db.Column(db.Integer, nullable=True)
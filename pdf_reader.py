@@ -1,21 +1,51 @@
 import fitz  # PyMuPDF
 
-def extract_text_from_pdf(file_path: str) -> str:
+# Plain-text extraction flags: no image/whitespace preservation, joined hyphenated words,
+# and clipping to the page mediabox as PyMuPDF does by default. TEXT_INHIBIT_SPACES is
+# deliberately left out: MuPDF's inserted gap spaces keep words apart in OCR'd decisions.
+TEXT_FLAGS = fitz.TEXT_DEHYPHENATE | fitz.TEXT_MEDIABOX_CLIP
+
+
+def _extract_until(doc, max_chars: int) -> str:
     """
-    Extracts text from a local PDF file path.
+    Extracts pages in order, stopping as soon as max_chars characters are buffered.
     """
-    doc = fitz.open(file_path)
-    full_text = ""
+    parts = []
+    total = 0
     for page in doc:
-        full_text += page.get_text()
-    return full_text
+        parts.append(page.get_text("text", flags=TEXT_FLAGS))
+        total += len(parts[-1])
+        if total >= max_chars:
+            break
+    return "".join(parts)[:max_chars]
+
+
+def extract_text_from_doc(doc, max_chars: int | None = None) -> str:
+    """
+    Extracts text from an already opened PyMuPDF document.
+    If max_chars is given, stops reading pages once that many characters are collected.
+    """
+    if max_chars:
+        return _extract_until(doc, max_chars)
+    parts = [None] * doc.page_count
+    for i, page in enumerate(doc):
+        parts[i] = page.get_text("text", flags=TEXT_FLAGS)
+    return "".join(parts)
 
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
+
+def extract_text_from_pdf(file_path: str, max_chars: int | None = None) -> str:
+    """
+    Extracts text from a local PDF file path.
+    If max_chars is given, stops reading pages once that many characters are collected.
+    """
+    with fitz.open(file_path) as doc:
+        return extract_text_from_doc(doc, max_chars)
+
+
+def extract_text_from_pdf_bytes(pdf_bytes: bytes, max_chars: int | None = None) -> str:
     """
     Extracts text from a PDF given as raw bytes (no need to save to disk).
+    If max_chars is given, stops reading pages once that many characters are collected.
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    full_text = ""
-    for page in doc:
-        full_text += page.get_text()
-    return full_text
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return extract_text_from_doc(doc, max_chars)
@@ -1,148 +1,423 @@
+import io
 import os
-import json
+import time
+import tempfile
 import hashlib
+import threading
 
-from dotenv import load_dotenv
-from openai import OpenAI
+import numpy as np
+import orjson
+import openai
+import requests
 
 from uscis_fetcher import download_pdf_bytes
 from pdf_reader import extract_text_from_pdf_bytes
-
-# Load API key
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_client import TEXT_PREFETCH_CHARS, get_client, truncate_to_tokens
+from case_extractor import (
+    EMBEDDING_MODEL,
+    MODEL_TAG,
+    embed_text,
+    extract_case_json,
+    ExtractionError,
+    build_extraction_request,
+    parse_completion,
+)
 
 CASES_DIR = "cases"
 os.makedirs(CASES_DIR, exist_ok=True)
 
+# How often to check on a submitted Batch API job
+BATCH_POLL_SECONDS = 30
+
+# Batch API input file limits: 50,000 requests and 200 MB (kept with some headroom)
+MAX_BATCH_LINES = 50000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+
+
+URL_INDEX_PATH = os.path.join(CASES_DIR, "_url_index.json")
+
+# Semantic cache: L2-normalized float32 embeddings, row i belongs to keys[i]
+EMBEDDINGS_PATH = os.path.join(CASES_DIR, "_embeddings.npy")
+EMBEDDING_KEYS_PATH = os.path.join(CASES_DIR, "_keys.json")
+SEMANTIC_TAG = f"{MODEL_TAG}|{EMBEDDING_MODEL}"
+SIMILARITY_THRESHOLD = 0.95
+
+# Facts that identify one specific decision; never carried over from a near-duplicate
+BORROWED_IDENTITY_FIELDS = {
+    "case_id": "unknown",
+    "decision_date": None,
+    "aao_docket_number": None,
+    "beneficiary_role": None,
+    "service_center": None,
+}
 
-def url_to_cache_key(url: str) -> str:
+# Guards the shared index files when cases are processed on several threads
+_INDEX_LOCK = threading.RLock()
+
+
+def _write_atomic(path: str, payload: bytes):
     """
-    Create a short, safe cache key from the URL using a hash.
+    Write a cache file via a temp file in CASES_DIR and os.replace, so readers
+    (and a crash mid-write) only ever see the old or the new complete file.
     """
-    h = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    fd, tmp_path = tempfile.mkstemp(dir=CASES_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def content_cache_key(text: str) -> str:
+    """
+    Create a short, safe cache key from the extracted decision text and the
+    model setup, so identical content served from different URLs shares one entry.
+    """
+    payload = f"{MODEL_TAG}\n{text}".encode("utf-8")
+    h = hashlib.sha256(payload).hexdigest()
     return h[:16]  # 16 hex chars is plenty
 
 
-def get_cached_case(url: str):
+def load_url_index() -> dict:
+    """
+    Return the url -> content key index for the current model setup.
+    """
+    with _INDEX_LOCK:
+        if os.path.exists(URL_INDEX_PATH):
+            with open(URL_INDEX_PATH, "rb") as f:
+                index = orjson.loads(f.read())
+            if index.get("model_tag") == MODEL_TAG:
+                return index["urls"]
+    return {}
+
+
+def save_url_index(entries: dict):
+    """
+    Merge url -> content key entries into the index so repeat URLs skip the download.
     """
-    Return cached JSON data for this URL if it exists, else None.
+    with _INDEX_LOCK:
+        urls = load_url_index()
+        urls.update(entries)
+        _write_atomic(URL_INDEX_PATH, orjson.dumps({"model_tag": MODEL_TAG, "urls": urls}, option=orjson.OPT_INDENT_2))
+
+
+def get_cached_case(key: str):
+    """
+    Return cached JSON data for this content key if it exists, else None.
     """
-    key = url_to_cache_key(url)
     json_path = os.path.join(CASES_DIR, f"{key}.json")
     if os.path.exists(json_path):
-        with open(json_path, "r") as f:
-            data = json.load(f)
+        with open(json_path, "rb") as f:
+            data = orjson.loads(f.read())
         return data
     return None
 
 
-def save_cached_case(url: str, data: dict):
+def save_cached_case(key: str, data: dict):
     """
-    Save structured JSON data for this URL so we don't re-fetch the PDF.
+    Save structured JSON data under this content key so we don't re-fetch the PDF.
     """
-    key = url_to_cache_key(url)
     json_path = os.path.join(CASES_DIR, f"{key}.json")
-    with open(json_path, "w") as f:
-        json.dump(data, f, indent=2)
+    _write_atomic(json_path, orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+
+def load_embedding_index():
+    """
+    Return (matrix, keys) for the semantic cache, or an empty index if none
+    exists yet or it was built with a different model setup.
+    """
+    with _INDEX_LOCK:
+        if os.path.exists(EMBEDDINGS_PATH) and os.path.exists(EMBEDDING_KEYS_PATH):
+            with open(EMBEDDING_KEYS_PATH, "rb") as f:
+                index = orjson.loads(f.read())
+            matrix = np.load(EMBEDDINGS_PATH)
+            keys = index["keys"]
+            # The .npy is written before _keys.json, so after an interrupted save it may
+            # hold one extra trailing row; rows beyond len(keys) are ignored.
+            if index.get("tag") == SEMANTIC_TAG and matrix.shape[0] >= len(keys):
+                return matrix[:len(keys)], keys
+    return None, []
+
+
+def find_similar_case(query: np.ndarray):
+    """
+    Return the content key of the most similar cached case if its cosine
+    similarity to the (normalized) query embedding clears the threshold, else None.
+    """
+    matrix, keys = load_embedding_index()
+    if matrix is None or not keys:
+        return None
+    scores = np.dot(matrix, query)
+    best = int(np.argmax(scores))
+    if scores[best] >= SIMILARITY_THRESHOLD:
+        return keys[best]
+    return None
+
+
+def save_case_embedding(key: str, query: np.ndarray):
+    """
+    Append this case's embedding to the semantic cache.
+    """
+    with _INDEX_LOCK:
+        matrix, keys = load_embedding_index()
+        row = query[np.newaxis, :]
+        matrix = row if matrix is None else np.vstack([matrix, row])
+        keys.append(key)
+        buf = io.BytesIO()
+        np.save(buf, matrix)
+        _write_atomic(EMBEDDINGS_PATH, buf.getvalue())
+        _write_atomic(EMBEDDING_KEYS_PATH, orjson.dumps({"tag": SEMANTIC_TAG, "keys": keys}))
+
+
+def borrow_similar_case(data: dict, similar_key: str) -> dict:
+    """
+    Adapt a near-duplicate decision's JSON for this document: blank out the
+    decision-specific identity fields and record where the rest came from.
+    """
+    borrowed = dict(data)
+    borrowed.update(BORROWED_IDENTITY_FIELDS)
+    borrowed["borrowed_from"] = similar_key
+    return borrowed
 
 
 def process_uscis_case(url: str) -> dict:
     """
     On-demand pipeline:
-    - Check cache
-    - If not cached, download PDF once, extract text, call OpenAI
+    - Check the URL index; a known URL is served from cache without downloading
+    - Otherwise download PDF once, extract text, and check the content-addressed cache
+    - Then check the semantic cache for a near-duplicate decision
+    - Only on a miss, call OpenAI
     - Store only JSON locally (no PDF), so we don't re-hit the USCIS URL
     - Return the structured JSON data as a Python dict
     """
 
-    # 1) Check cache first
-    cached = get_cached_case(url)
-    if cached is not None:
-        print(f"📦 Using cached structured data for URL:\n{url}\n")
-        return cached
+    # 1) Check cache first via the URL index
+    known_key = load_url_index().get(url)
+    if known_key is not None:
+        cached = get_cached_case(known_key)
+        if cached is not None:
+            print(f"📦 Using cached structured data for URL:\n{url}\n")
+            return cached
 
     # 2) Not cached: fetch PDF once
     print(f"🔗 Fetching PDF from: {url}")
     pdf_bytes = download_pdf_bytes(url)
 
-    # 3) Extract text in memory
+    # 3) Extract text in memory (parallel across pages, stops once the budget is read)
     print("📄 Extracting text from PDF (in memory)...")
-    full_text = extract_text_from_pdf_bytes(pdf_bytes)
-    text_chunk = full_text[:12000]
-
-    # 4) Build prompt (strict, no-hallucination rules)
-    system_message = (
-        "You are an expert U.S. immigration law assistant. "
-        "Given a USCIS or AAO decision, you extract key case facts into a strict JSON object. "
-        "You NEVER guess or infer information. You ONLY extract information explicitly stated in the text."
-    )
+    text_chunk = truncate_to_tokens(extract_text_from_pdf_bytes(pdf_bytes, max_chars=TEXT_PREFETCH_CHARS))
 
-    user_message = f"""
-Read the following USCIS/AAO decision text and extract the key information into a JSON object.
-
-Return ONLY valid JSON. Do not include any explanation or commentary, just the JSON.
-
-IMPORTANT RULES (DO NOT BREAK THESE):
-- NEVER guess, infer, approximate, assume, or fabricate any information.
-- ONLY include values that are explicitly stated in the text.
-- If a value is not explicitly stated, set to null (for dates/numbers) or "unknown" (for strings).
-- If you are unsure, return null/unknown.
-- If the field cannot be copied VERBATIM from the text, return null/unknown.
-
-The JSON object MUST have exactly these fields:
-
-- case_id: string (ONLY if the decision text explicitly contains a case number, AAO reference, or receipt number. If not explicitly present, set to "unknown". Do NOT infer or guess.)
-- visa_type: string or null (examples: "O-1", "H-1B", "EB-2", "unknown")
-- case_type: string (examples: "initial", "appeal", "motion", "unknown")
-- beneficiary_role: string or null
-- decision_outcome: string (one of: "approved", "denied", "dismissed", "sustained", "withdrawn", "remanded", "unknown")
-- decision_date: string or null (ONLY if explicitly shown. Use ISO format "YYYY-MM-DD". Do NOT infer or guess ANY dates.)
-- service_center: string or null (ONLY if explicitly shown. Do NOT infer, even if hints exist.)
-- aao_docket_number: string or null (ONLY if explicitly present. Never guess.)
-- regulatory_citations: array of strings (ONLY citations explicitly shown)
-- issues: array of strings
-- criteria_met: array of strings
-- criteria_not_met: array of strings
-- procedural_issues: array of strings
-- key_evidence: array of strings
-- risk_factors: array of strings
-- notes: string
-
-If a field is not explicitly stated in the text, set it to null or "unknown" as appropriate.
-
-Decision text:
-{text_chunk}
-"""
-
-    # 5) Call OpenAI
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message},
-        ],
-    )
+    # 4) Same content already extracted (e.g. a mirror or redirect URL)?
+    key = content_cache_key(text_chunk)
+    cached = get_cached_case(key)
+    if cached is not None:
+        save_url_index({url: key})
+        print(f"📦 Using cached structured data for identical content:\n{url}\n")
+        return cached
 
-    raw_content = response.choices[0].message.content
+    # 5) Near-duplicate decision (same template, different beneficiary)?
+    # Skipped for PDFs with no text layer: there is nothing to embed.
+    query = None
+    if text_chunk.strip():
+        query = np.asarray(embed_text(text_chunk), dtype=np.float32)
+        query /= np.linalg.norm(query)
+        similar_key = find_similar_case(query)
+        if similar_key is not None:
+            cached = get_cached_case(similar_key)
+            if cached is not None:
+                # Borrowed from another decision: identity fields cleared, tagged with its source,
+                # and never stored as this content's entry
+                print(f"📦 Using cached structured data for a near-duplicate decision:\n{url}\n")
+                return borrow_similar_case(cached, similar_key)
 
-    # 6) Parse JSON
-    try:
-        data = json.loads(raw_content)
-    except json.JSONDecodeError:
-        print("❌ Failed to parse JSON. Raw model output:")
-        print(raw_content)
-        raise
+    # 6) Call OpenAI with the strict, no-hallucination extraction prompt
+    data = extract_case_json(text_chunk)
 
     # 7) Save to cache and return
-    save_cached_case(url, data)
+    save_cached_case(key, data)
+    save_url_index({url: key})
+    if query is not None:
+        save_case_embedding(key, query)
     print(f"\n✅ Saved structured data to cache in '{CASES_DIR}'")
     return data
 
 
+def _split_batch_lines(lines: list) -> list:
+    """
+    Split JSONL request lines into chunks that each fit one Batch API input file.
+    """
+    chunks = [[]]
+    size = 0
+    for line in lines:
+        line_size = len(line) + 1  # newline separator
+        if chunks[-1] and (len(chunks[-1]) >= MAX_BATCH_LINES or size + line_size > MAX_BATCH_BYTES):
+            chunks.append([])
+            size = 0
+        chunks[-1].append(line)
+        size += line_size
+    return chunks
+
+
+def _submit_batch(client, model: str, lines: list, part: int):
+    """
+    Upload one file of a model's JSONL requests and start a Batch API job for it.
+    The Batch API accepts a single model per input file.
+    """
+    batch_file = client.files.create(
+        file=(f"cases_batch_{model}_{part}.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"🧾 Submitted batch {batch.id} ({model}, part {part}) with {len(lines)} decisions")
+    return batch
+
+
+def _wait_for_batch(client, batch):
+    """
+    Poll a batch until it finishes and return its final state.
+    """
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(BATCH_POLL_SECONDS)
+        batch = client.batches.retrieve(batch.id)
+    return batch
+
+
+def _report_batch_errors(client, batch):
+    """
+    Print every request the Batch API put in the batch's error file.
+    """
+    if not batch.error_file_id:
+        return
+    errors = client.files.content(batch.error_file_id).read()
+    for line in errors.splitlines():
+        if not line.strip():
+            continue
+        item = orjson.loads(line)
+        detail = item.get("error") or (item.get("response") or {}).get("body")
+        print(f"❌ Batch request failed for content key {item.get('custom_id')}: {detail}")
+
+
+def batch_extract(urls: list[str]) -> dict:
+    """
+    Bulk pipeline for prebuilding the cases/ cache through OpenAI's Batch API:
+    - Serve URLs that are already cached without any OpenAI call
+    - Download and extract text locally for the rest, one request per unique content key
+    - Upload the requests grouped by model (the Batch API allows one model per file),
+      split into files within the Batch API size limits, poll until they finish,
+      and cache each result
+    - URLs that fail to download/extract, and items that fail, are refused or are
+      truncated, are reported and skipped rather than aborting the run
+    - Return {url: structured JSON data} for every URL that has a result
+    """
+    results = {}
+    pending = {}  # content key -> text chunk
+    urls_by_key = {}  # content key -> URLs serving that content
+
+    # Read the URL index once and write all new entries once at the end
+    url_index = load_url_index()
+    new_index_entries = {}
+
+    try:
+        for url in urls:
+            known_key = url_index.get(url)
+            cached = get_cached_case(known_key) if known_key is not None else None
+            if cached is not None:
+                results[url] = cached
+                continue
+
+            print(f"🔗 Fetching PDF from: {url}")
+            try:
+                pdf_bytes = download_pdf_bytes(url)
+                text_chunk = truncate_to_tokens(extract_text_from_pdf_bytes(pdf_bytes, max_chars=TEXT_PREFETCH_CHARS))
+            except (requests.RequestException, ValueError, RuntimeError) as e:
+                # RuntimeError covers PyMuPDF's errors for corrupt or non-PDF data
+                print(f"❌ Skipping {url}: {e}")
+                continue
+
+            key = content_cache_key(text_chunk)
+            cached = get_cached_case(key)
+            if cached is not None:
+                new_index_entries[url] = key
+                results[url] = cached
+                continue
+
+            pending[key] = text_chunk
+            urls_by_key.setdefault(key, []).append(url)
+
+        if not pending:
+            return results
+
+        # One JSONL line per unique decision, grouped by model; custom_id maps the result back to its cache key
+        lines_by_model = {}
+        for key, text_chunk in pending.items():
+            body = build_extraction_request(text_chunk)
+            lines_by_model.setdefault(body["model"], []).append(orjson.dumps({
+                "custom_id": key,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }))
+
+        client = get_client()
+        batches = []
+        for model, lines in lines_by_model.items():
+            for part, chunk in enumerate(_split_batch_lines(lines), start=1):
+                try:
+                    batches.append(_submit_batch(client, model, chunk, part))
+                except openai.OpenAIError as e:
+                    # Keep the other files going; only this file's decisions are lost
+                    print(f"❌ Failed to submit {len(chunk)} decisions ({model}, part {part}): {e}")
+
+        for batch in batches:
+            batch = _wait_for_batch(client, batch)
+            if batch.status != "completed":
+                print(f"❌ Batch {batch.id} ended with status '{batch.status}'")
+            _report_batch_errors(client, batch)
+            if not batch.output_file_id:
+                continue
+
+            output = client.files.content(batch.output_file_id).read()
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                key = item["custom_id"]
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    print(f"❌ Batch request failed for content key {key}: {item.get('error') or response}")
+                    continue
+
+                choice = response["body"]["choices"][0]
+                try:
+                    data = parse_completion(
+                        choice["message"].get("content"),
+                        choice.get("finish_reason"),
+                        choice["message"].get("refusal"),
+                    )
+                except (ExtractionError, orjson.JSONDecodeError) as e:
+                    # One bad response shouldn't discard the rest of the batch
+                    print(f"❌ Skipping content key {key}: {e}")
+                    continue
+                save_cached_case(key, data)
+                for url in urls_by_key[key]:
+                    new_index_entries[url] = key
+                    results[url] = data
+    finally:
+        if new_index_entries:
+            save_url_index(new_index_entries)
+
+    print(f"\n✅ Saved batch results to cache in '{CASES_DIR}'")
+    return results
+
+
 if __name__ == "__main__":
     # Example manual test; replace with a real URL if you want
     test_url = "https://www.uscis.gov/sites/default/files/err/B5%20-%20Members%20of%20the%20Professions%20holding%20Advanced%20Degrees%20or%20Aliens%20of%20Exceptional%20Ability/Decisions_Issued_in_2025/MAR122025_01B5203.pdf"
     result = process_uscis_case(test_url)
-    print(json.dumps(result, indent=2))
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
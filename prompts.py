@@ -0,0 +1,111 @@
+"""
+Shared prompts for structured case extraction.
+"""
+
+import json
+
+SYSTEM_MESSAGE = (
+    "You are an expert U.S. immigration law assistant. "
+    "Given a USCIS or AAO decision, you extract key case facts into a strict JSON object. "
+    "You NEVER guess or infer information. You ONLY extract information explicitly stated in the text."
+)
+
+_STRING = {"type": "string"}
+_NULLABLE_STRING = {"type": ["string", "null"]}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# Strict response schema for structured outputs; also rendered into the prompt below
+CASE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "case_id": _STRING,
+        "visa_type": _NULLABLE_STRING,
+        "case_type": {"type": "string", "enum": ["initial", "appeal", "motion", "unknown"]},
+        "beneficiary_role": _NULLABLE_STRING,
+        "decision_outcome": {
+            "type": "string",
+            "enum": ["approved", "denied", "dismissed", "sustained", "withdrawn", "remanded", "unknown"],
+        },
+        "decision_date": _NULLABLE_STRING,
+        "service_center": _NULLABLE_STRING,
+        "aao_docket_number": _NULLABLE_STRING,
+        "regulatory_citations": _STRING_LIST,
+        "issues": _STRING_LIST,
+        "criteria_met": _STRING_LIST,
+        "criteria_not_met": _STRING_LIST,
+        "procedural_issues": _STRING_LIST,
+        "key_evidence": _STRING_LIST,
+        "risk_factors": _STRING_LIST,
+        "notes": _STRING,
+    },
+    "required": [
+        "case_id",
+        "visa_type",
+        "case_type",
+        "beneficiary_role",
+        "decision_outcome",
+        "decision_date",
+        "service_center",
+        "aao_docket_number",
+        "regulatory_citations",
+        "issues",
+        "criteria_met",
+        "criteria_not_met",
+        "procedural_issues",
+        "key_evidence",
+        "risk_factors",
+        "notes",
+    ],
+    "additionalProperties": False,
+}
+
+# Prompt notation for fields whose JSON schema type alone is too loose
+_FIELD_HINTS = {"decision_date": "YYYY-MM-DD|null"}
+
+
+def _schema_hint(name: str, spec: dict):
+    """
+    Render one CASE_SCHEMA property in the prompt's compact notation.
+    """
+    if name in _FIELD_HINTS:
+        return _FIELD_HINTS[name]
+    if "enum" in spec:
+        return "|".join(spec["enum"])
+    if spec["type"] == "array":
+        return ["str"]
+    if spec["type"] == ["string", "null"]:
+        return "str|null"
+    return "str"
+
+
+def _build_prefix() -> str:
+    """
+    Build the static part of the user message once, at import time.
+    """
+    schema_line = json.dumps(
+        {name: _schema_hint(name, spec) for name, spec in CASE_SCHEMA["properties"].items()},
+        separators=(",", ":"),
+    )
+    return (
+        "Extract the key facts of the USCIS/AAO decision below into one JSON object. Output JSON only.\n"
+        "\n"
+        "###Rules\n"
+        "- No guessing. Copy verbatim or null/unknown.\n"
+        "- Only values explicitly stated in the text. Unsure = null/unknown.\n"
+        '- Missing: null for dates/numbers, "unknown" for strings.\n'
+        "\n"
+        "###Schema\n"
+        f"{schema_line}\n"
+        'Legend: a|b = one of; ["str"] = array of strings; exactly these fields. '
+        'case_id = case/AAO/receipt number if present, else "unknown". '
+        'visa_type e.g. "O-1", "H-1B", "EB-2". '
+        "decision_date, service_center, aao_docket_number, regulatory_citations: only if explicitly shown.\n"
+        "\n"
+        "###Text\n"
+    )
+
+
+# Constant prefix of the user message; the decision text is appended after it.
+# Built once and never interpolated per call, so it stays byte-identical and
+# OpenAI's prompt cache can match on it.
+STATIC_RULES = _build_prefix()
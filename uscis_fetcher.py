@@ -1,15 +1,35 @@
+import io
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Read size for streamed downloads
+CHUNK_SIZE = 65536
+
+# One pooled session for all downloads, so repeat fetches from the same host reuse connections
+_SESSION = requests.Session()
+_retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504))
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=_retry)
+_SESSION.mount("https://", _adapter)
+_SESSION.mount("http://", _adapter)
+
 
 def download_pdf_bytes(url: str) -> bytes:
     """
     Download a PDF from a given URL and return its raw bytes.
     Assumes the URL points directly to a PDF on a site like USCIS/AAO.
+    The Content-Type is checked before any of the body is read.
     """
-    resp = requests.get(url, stream=True, timeout=30)
-    resp.raise_for_status()
+    with _SESSION.get(url, stream=True, timeout=30) as resp:
+        resp.raise_for_status()
+
+        content_type = resp.headers.get("Content-Type", "")
+        if "pdf" not in content_type.lower():
+            raise ValueError(f"URL does not appear to be a PDF. Content-Type: {content_type}")
 
-    content_type = resp.headers.get("Content-Type", "")
-    if "pdf" not in content_type.lower():
-        raise ValueError(f"URL does not appear to be a PDF. Content-Type: {content_type}")
+        buf = io.BytesIO()
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            buf.write(chunk)
 
-    return resp.content
+    return buf.getvalue()
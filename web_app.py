@@ -1,87 +1,63 @@
-import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, request, render_template_string
+import orjson
+
+from flask import Flask, request, render_template, redirect, url_for, jsonify
 
 from process_case_from_url import process_uscis_case
 
 app = Flask(__name__)
 
-PAGE_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>Imli – USCIS Case Analyzer</title>
-    <style>
-        body { font-family: system-ui, -apple-system, BlinkMacSystemFont, sans-serif; margin: 2rem; max-width: 900px; }
-        h1 { margin-bottom: 0.5rem; }
-        form { margin-bottom: 1.5rem; }
-        input[type="text"] { width: 100%; padding: 0.5rem; font-size: 1rem; }
-        button { padding: 0.5rem 1rem; font-size: 1rem; cursor: pointer; }
-        .error { color: #b00020; margin-bottom: 1rem; }
-        .card { border: 1px solid #ddd; border-radius: 8px; padding: 1rem; margin-top: 1rem; }
-        .field-label { font-weight: 600; }
-        pre { background: #f6f6f6; padding: 1rem; border-radius: 6px; overflow-x: auto; }
-        ul { padding-left: 1.2rem; }
-    </style>
-</head>
-<body>
-    <h1>Imli – USCIS/AAO Case Analyzer</h1>
-    <p>Paste a direct USCIS/AAO PDF URL below. Imli will fetch the decision, extract the text, and return a structured analysis.</p>
-
-    <form method="POST">
-        <label for="url"><strong>USCIS/AAO PDF URL</strong></label><br>
-        <input type="text" id="url" name="url" value="{{ url|default('') }}" placeholder="https://www.uscis.gov/sites/default/files/err/.../DECISION.pdf">
-        <br><br>
-        <button type="submit">Analyze</button>
-    </form>
-
-    {% if error %}
-        <div class="error">{{ error }}</div>
-    {% endif %}
-
-    {% if result %}
-        <div class="card">
-            <h2>Case Overview</h2>
-            <p><span class="field-label">Visa Type:</span> {{ result.visa_type or 'unknown' }}</p>
-            <p><span class="field-label">Case Type:</span> {{ result.case_type or 'unknown' }}</p>
-            <p><span class="field-label">Decision Outcome:</span> {{ result.decision_outcome or 'unknown' }}</p>
-            <p><span class="field-label">Decision Date:</span> {{ result.decision_date or 'unknown' }}</p>
-            <p><span class="field-label">Service Center:</span> {{ result.service_center or 'unknown' }}</p>
-            <p><span class="field-label">Beneficiary Role:</span> {{ result.beneficiary_role or 'unknown' }}</p>
-
-            {% if result.issues %}
-                <h3>Key Issues</h3>
-                <ul>
-                {% for issue in result.issues %}
-                    <li>{{ issue }}</li>
-                {% endfor %}
-                </ul>
-            {% endif %}
-
-            {% if result.criteria_not_met %}
-                <h3>Criteria Not Met</h3>
-                <ul>
-                {% for c in result.criteria_not_met %}
-                    <li>{{ c }}</li>
-                {% endfor %}
-                </ul>
-            {% endif %}
-
-            {% if result.notes %}
-                <h3>Notes</h3>
-                <p>{{ result.notes }}</p>
-            {% endif %}
-        </div>
-
-        <div class="card">
-            <h2>Full JSON</h2>
-            <pre>{{ json_text }}</pre>
-        </div>
-    {% endif %}
-</body>
-</html>
-"""
+# Background workers for the fetch -> extract -> OpenAI pipeline, so requests never block on it.
+# Jobs live in this process's memory: run a single process, e.g.
+#   gunicorn -w 1 -k gthread --threads 8 web_app:app
+executor = ThreadPoolExecutor(max_workers=8)
+jobs = {}  # job_id -> {"url": str, "future": Future, "finished_at": float | None}
+jobs_lock = threading.Lock()
+
+# Finished jobs (and their results) are dropped this long after completion
+JOB_TTL_SECONDS = 3600
+
+
+def submit_job(url: str) -> str:
+    """
+    Start the pipeline for this URL on a worker and return the new job id.
+    """
+    job_id = uuid.uuid4().hex
+    job = {"url": url, "future": None, "finished_at": None}
+
+    def mark_finished(_future):
+        job["finished_at"] = time.monotonic()
+
+    with jobs_lock:
+        job["future"] = executor.submit(process_uscis_case, url)
+        jobs[job_id] = job
+    job["future"].add_done_callback(mark_finished)
+    return job_id
+
+
+def get_job(job_id: str):
+    """
+    Return the job for this id, or None if it is unknown or has expired.
+    Expired jobs are evicted here, so memory stays bounded by recent work.
+    """
+    cutoff = time.monotonic() - JOB_TTL_SECONDS
+    with jobs_lock:
+        expired = [
+            jid for jid, job in jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for jid in expired:
+            del jobs[jid]
+        return jobs.get(job_id)
+
+
+class Obj(dict):
+    # Flask/Jinja likes attribute-style access; wrap in SimpleNamespace-like object
+    __getattr__ = dict.get
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -89,32 +65,61 @@ def index():
     url = ""
     result = None
     error = None
+    pending = False
+    job_id = request.args.get("job")
 
     if request.method == "POST":
         url = request.form.get("url", "").strip()
         if not url:
             error = "Please enter a URL."
         else:
-            try:
-                data = process_uscis_case(url)
-                # Flask/Jinja likes attribute-style access; wrap in SimpleNamespace-like object
-                class Obj(dict):
-                    __getattr__ = dict.get
-                result = Obj(data)
-            except Exception as e:
-                error = f"Error processing URL: {e}"
-
-    json_text = json.dumps(result, indent=2) if result else ""
-
-    return render_template_string(
-        PAGE_TEMPLATE,
+            # Hand the pipeline to a worker and let the page poll for the result
+            job_id = submit_job(url)
+            return redirect(url_for("index", job=job_id))
+    elif job_id:
+        job = get_job(job_id)
+        if job is None:
+            error = "Unknown or expired job."
+        else:
+            url = job["url"]
+            future = job["future"]
+            if not future.done():
+                pending = True
+            elif future.exception() is not None:
+                error = f"Error processing URL: {future.exception()}"
+            else:
+                result = Obj(future.result())
+
+    json_text = orjson.dumps(result, option=orjson.OPT_INDENT_2).decode() if result else ""
+
+    return render_template(
+        "index.html",
         url=url,
         result=result,
         json_text=json_text,
         error=error,
+        pending=pending,
+        job_id=job_id,
     )
 
 
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """
+    Report the status of a background job: pending, done (with result), or error.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"status": "unknown"}), 404
+
+    future = job["future"]
+    if not future.done():
+        return jsonify({"status": "pending", "result": None})
+    if future.exception() is not None:
+        return jsonify({"status": "error", "error": str(future.exception()), "result": None})
+    return jsonify({"status": "done", "result": future.result()})
+
+
 if __name__ == "__main__":
-    # Run the app locally
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    # Run the app locally (threaded so polling doesn't wait behind other requests)
+    app.run(host="127.0.0.1", port=5000, debug=True, threaded=True)